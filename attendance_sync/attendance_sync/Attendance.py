@@ -1,16 +1,61 @@
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
 
+import ciso8601
+import msgspec
+import orjson
 import requests
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPDigestAuth
-import json
+from urllib3.util import Retry
 import frappe
 from frappe import _
+from frappe.utils import get_datetime
+from frappe.utils.caching import redis_cache
+from frappe.utils.synchronization import filelock
 from hrms.hr.doctype.employee_checkin.employee_checkin import add_log_based_on_employee_field
 
+# Fixed time zone of the device (UTC+06:00)
+DEVICE_TIMEZONE = timezone(timedelta(hours=6))
+# Datetime format stored in the Employee Checkin and Shift Type tables
+CHECKIN_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+# Default number of logs requested from a device per page
+DEFAULT_ATTENDANCE_DEPTH = 100
+# Maximum number of requests in flight to a device at the same time
+MAX_PAGE_WORKERS = 8
+# File lock serializing the duplicate check and check-in inserts across concurrent syncs
+CHECKIN_LOCK_NAME = "attendance_sync_checkins"
+# Seconds to wait for the check-in lock before giving up
+CHECKIN_LOCK_TIMEOUT = 600
+# (connect, read) timeout in seconds for each request to a device
+REQUEST_TIMEOUT = (5, 30)
+# Retry policy for connection errors and server errors from a device
+REQUEST_RETRY = Retry(total=3, backoff_factor=0.5, status_forcelist=[500, 502, 503, 504],
+                      allowed_methods=["POST"])
+
+
+class AcsEventRecord(msgspec.Struct):
+    """A single attendance log of an `AcsEvent` response, limited to the fields that are used."""
+    employeeNoString: str | None = None
+    time: str | None = None
+
+
+class AcsEventPage(msgspec.Struct):
+    """The `AcsEvent` object of a response: one page of attendance logs."""
+    totalMatches: int = 0
+    InfoList: list[AcsEventRecord] = []
+
+
+class AcsEventResponse(msgspec.Struct):
+    """The body of an `AcsEvent` search response."""
+    AcsEvent: AcsEventPage | None = None
+
 
 class Attendance:
-    def __init__(self, device_ip, major, minor, device_user, device_password):
+    def __init__(self, device_ip, major, minor, device_user, device_password,
+                 attendance_depth=DEFAULT_ATTENDANCE_DEPTH):
         """
         Initializes the device configuration for attendance fetching.
 
@@ -23,22 +68,36 @@ class Attendance:
             minor (int): Minor version of the device firmware (used for compatibility checks).
             device_user (str): Username for authenticating with the device.
             device_password (str): Password for authenticating with the device.
+            attendance_depth (int): Number of logs to request from the device per page
+                                    (defaults to `DEFAULT_ATTENDANCE_DEPTH`).
 
         Attributes:
             device_ip (str): Stores the device's IP address.
-            attendance_depth (int): The number of days of attendance to fetch by default (set to 30).
+            attendance_depth (int): The number of logs requested per page. Lowered while fetching
+                                    if the device rejects or caps the page size.
             major (int): Stores the major firmware version.
             minor (int): Stores the minor firmware version.
             device_user (str): Stores the username for device authentication.
             device_user_password (str): Stores the password for device authentication.
+            _session (requests.Session): Keep-alive HTTP session authenticated against the device,
+                                         reused for every request so the connection and digest
+                                         nonce are not renegotiated per page.
         """
         self.device_ip = device_ip
-        self.attendance_depth = 30
+        self.attendance_depth = int(attendance_depth or DEFAULT_ATTENDANCE_DEPTH)
         self.major = int(major)
         self.minor = int(minor)
         self.device_user = device_user
         self.device_user_password = device_password
 
+        self._session = requests.Session()
+        self._session.auth = HTTPDigestAuth(self.device_user, self.device_user_password)
+        self._session.headers.update({'Connection': 'keep-alive'})
+        # Block instead of opening extra connections, so at most `MAX_PAGE_WORKERS`
+        # requests are ever in flight to the device
+        self._session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=MAX_PAGE_WORKERS,
+                                                   pool_block=True, max_retries=REQUEST_RETRY))
+
     def _format_time(self, time_obj):
         """
         Helper function to format a datetime object or string into the device-required format.
@@ -58,47 +117,128 @@ class Attendance:
             ValueError: If the string input is not in a valid ISO 8601 format.
 
         Notes:
-            - The time zone offset is hardcoded to '+06:00'.
-            - If the input string includes a 'Z' (indicating UTC), it is replaced with '+00:00'
-              before parsing.
+            - The time zone is hardcoded to '+06:00' (`DEVICE_TIMEZONE`).
+            - Naive inputs are taken to be in the device time zone; aware inputs are converted to it.
+            - Strings are parsed with `ciso8601`, which accepts a 'Z' (indicating UTC) suffix.
 
         Example:
-            _input_: '2025-01-07T12:34:56Z'
+            _input_: '2025-01-07T12:34:56'
+            _output_: '2025-01-07T12:34:56+06:00'
+
+            _input_: '2025-01-07T06:34:56Z'
             _output_: '2025-01-07T12:34:56+06:00'
         """
         if isinstance(time_obj, str):
-            time_obj = datetime.fromisoformat(time_obj.replace("Z", "+00:00"))
-        return time_obj.strftime("%Y-%m-%dT%H:%M:%S") + "+06:00"
+            time_obj = ciso8601.parse_datetime(time_obj)
+        if time_obj.tzinfo is None:
+            time_obj = time_obj.replace(tzinfo=DEVICE_TIMEZONE)
+        return time_obj.astimezone(DEVICE_TIMEZONE).isoformat(timespec="seconds")
+
+    def _build_search_condition(self, start_time, end_time):
+        """
+        Serialize the parts of the `AcsEventCond` search condition shared by all pages.
+
+        Parameters:
+            start_time (str): The start time for fetching logs in the format 'YYYY-MM-DDTHH:MM:SS+06:00'.
+            end_time (str): The end time for fetching logs in the format 'YYYY-MM-DDTHH:MM:SS+06:00'.
+
+        Returns:
+            bytes: The JSON members of the condition without the enclosing braces, to be
+            completed per page by `_fetch_page`.
+
+        Example:
+            _input_: start_time = '2025-01-07T00:00:00+06:00', end_time = '2025-01-07T23:59:59+06:00'
+            _output_: b'"searchID":"1","major":5,"minor":0,"startTime":"2025-01-07T00:00:00+06:00",...'
+        """
+        return orjson.dumps({
+            "searchID": "1",
+            "major": self.major,
+            "minor": self.minor,
+            "startTime": start_time,
+            "endTime": end_time
+        })[1:-1]
+
+    def _fetch_page(self, search_result_position, search_condition):
+        """
+        Fetch a single page of attendance logs from the device.
+
+        Parameters:
+            search_result_position (int): The offset of the first record of the page.
+            search_condition (bytes): The shared search condition built by `_build_search_condition`.
+
+        Returns:
+            AcsEventPage or None: The `AcsEvent` object of the response (containing `totalMatches`
+            and `InfoList`), or `None` if the response has no `AcsEvent`.
+
+        Raises:
+            requests.exceptions.RequestException: If there is a network-related error during API communication.
+            HTTPError: If the API responds with a 4xx or 5xx status code.
+            msgspec.MsgspecError: If the response is not a valid `AcsEvent` JSON document.
+
+        Notes:
+            - Only the page position and size are serialized per page; they are spliced in
+              front of the pre-serialized `search_condition`.
+            - The response is decoded with `msgspec` into `AcsEventResponse`, skipping
+              the fields that are not used.
+            - The request times out after `REQUEST_TIMEOUT`, and connection errors and 5xx
+              responses are retried with backoff according to `REQUEST_RETRY`.
+        """
+        url = f"http://{self.device_ip}/ISAPI/AccessControl/AcsEvent?format=json"
+        headers = {'Content-Type': 'application/json'}
+        payload = b'{"AcsEventCond":{"searchResultPosition":%d,"maxResults":%d,%b}}' % (
+            search_result_position, self.attendance_depth, search_condition
+        )
+
+        response = self._session.post(
+            url,
+            data=payload,
+            headers=headers,
+            timeout=REQUEST_TIMEOUT
+        )
+        response.raise_for_status()  # Raise HTTPError for bad responses (4xx and 5xx)
+        return msgspec.json.decode(response.content, type=AcsEventResponse).AcsEvent
 
     def fetch_all_attendance_logs(self, start_time, end_time):
         """
             Fetch all attendance logs from the device, handling pagination.
 
             This method retrieves attendance logs from a device using its API.
-            It handles pagination by iteratively fetching data in batches based on the
-            maximum results allowed per request (`self.attendance_depth`).
+            It fetches the first page to learn the total number of matches, then fetches the
+            remaining pages concurrently in batches based on the maximum results allowed per
+            request (`self.attendance_depth`).
+
+            If the device rejects the page size with a 400 or 413 response, the page size is
+            halved until it is accepted. If the device returns fewer records than requested
+            while more matches remain, the page size is lowered to what it returned.
 
             Parameters:
                 start_time (str): The start time for fetching logs in the format 'YYYY-MM-DDTHH:MM:SS+06:00'.
                 end_time (str): The end time for fetching logs in the format 'YYYY-MM-DDTHH:MM:SS+06:00'.
 
             Returns:
-                list: A list of all attendance records fetched from the device.
+                list: A list of all attendance records (`AcsEventRecord`) fetched from the device,
+                in device order.
 
             Attributes Accessed:
                 - `self.device_ip`: Device IP address.
                 - `self.attendance_depth`: Maximum number of results per request.
                 - `self.major` and `self.minor`: Event types to filter the results.
-                - `self.device_user` and `self.device_user_password`: Credentials for device authentication.
-
-            Raises:
-                requests.exceptions.RequestException: If there is a network-related error during API communication.
-                HTTPError: If the API responds with a 4xx or 5xx status code.
+                - `self._session`: Authenticated HTTP session used for the requests.
 
             Notes:
                 - Uses HTTP Digest Authentication (`HTTPDigestAuth`) for secure API communication.
-                - Stops fetching further data once all matches are retrieved or if an error occurs.
-                - Logs are fetched in JSON format and returned as a list of dictionaries.
+                - Requests go through `self._session`, keeping the connections to the device alive
+                  across pages.
+                - Only one request is made when there are no matches or the first page holds
+                  all of them.
+                - Once a page comes back short, empty or fails, the pages after it that have not
+                  been requested yet are cancelled.
+                - Up to `MAX_PAGE_WORKERS` pages are requested at the same time.
+                - The search condition is serialized once; only the page position and size are
+                  serialized per request.
+                - If a page still fails with a `RequestException` after retries, or cannot be
+                  decoded, the failure is logged once and the records of the pages before it
+                  are returned.
 
             Example:
                 _input_:
@@ -106,99 +246,106 @@ class Attendance:
                     end_time = '2025-01-07T23:59:59+06:00'
                 _output_:
                     [
-                        {"cardNo": "12345", "eventTime": "2025-01-07T12:00:00+06:00", ...},
-                        {"cardNo": "67890", "eventTime": "2025-01-07T12:05:00+06:00", ...},
+                        AcsEventRecord(employeeNoString="12345", time="2025-01-07T12:00:00+06:00"),
+                        AcsEventRecord(employeeNoString="67890", time="2025-01-07T12:05:00+06:00"),
                         ...
                     ]
             """
-        url = f"http://{self.device_ip}/ISAPI/AccessControl/AcsEvent?format=json"
-        headers = {'Content-Type': 'application/json'}
-
-        all_records = []
-        search_result_position = 0
-        max_results = self.attendance_depth
+        logger = frappe.logger("attendance_sync")
+        search_condition = self._build_search_condition(start_time, end_time)
 
+        # Probe the page size: halve it while the device rejects it as too large
         while True:
-            payload = {
-                "AcsEventCond": {
-                    "searchID": "1",
-                    "searchResultPosition": search_result_position,
-                    "maxResults": max_results,
-                    "major": self.major,
-                    "minor": self.minor,
-                    "startTime": start_time,
-                    "endTime": end_time
-                }
-            }
-
             try:
-                response = requests.post(
-                    url,
-                    data=json.dumps(payload),
-                    headers=headers,
-                    auth=HTTPDigestAuth(self.device_user, self.device_user_password)
-                )
-
-                response.raise_for_status()  # Raise HTTPError for bad responses (4xx and 5xx)
-                data = response.json()
-
-                if "AcsEvent" in data:
-                    total_matches = data["AcsEvent"].get("totalMatches", 0)
-
-                    if "InfoList" in data["AcsEvent"]:
-                        info_list = data["AcsEvent"]["InfoList"]
-                        all_records.extend(info_list)
+                first_page = self._fetch_page(0, search_condition)
+                break
+            except requests.exceptions.HTTPError as e:
+                if e.response is not None and e.response.status_code in (400, 413) \
+                        and self.attendance_depth > 1:
+                    self.attendance_depth //= 2
+                    continue
+                error = e
+            except (requests.exceptions.RequestException, msgspec.MsgspecError) as e:
+                error = e
+            logger.warning(f"Failed to fetch attendance logs from device {self.device_ip}: {error}")
+            return []
+
+        if not first_page:
+            return []
+
+        all_records = list(first_page.InfoList)
+        total_matches = first_page.totalMatches
+
+        # Stop if there are no matches, or the first page already holds all of them
+        if not total_matches or not all_records or len(all_records) >= total_matches:
+            return all_records
+
+        # The device may return fewer records than requested; page by what it returned
+        if len(all_records) < self.attendance_depth:
+            self.attendance_depth = len(all_records)
+        max_results = self.attendance_depth
 
-                    # Update the search result position for the next request
-                    search_result_position += max_results
+        # Fetch the remaining pages concurrently, then concatenate them in order
+        offsets = range(max_results, total_matches, max_results)
+        with ThreadPoolExecutor(max_workers=min(MAX_PAGE_WORKERS, len(offsets))) as executor:
+            futures = [
+                executor.submit(self._fetch_page, offset, search_condition)
+                for offset in offsets
+            ]
+            for offset, future in zip(offsets, futures):
+                try:
+                    page = future.result()
+                except (requests.exceptions.RequestException, msgspec.MsgspecError) as e:
+                    logger.warning(
+                        f"Failed to fetch attendance logs from device {self.device_ip} at position "
+                        f"{offset}, keeping the {len(all_records)} logs fetched before it: {e}"
+                    )
+                    break
+                if not page:
+                    break
+                all_records.extend(page.InfoList)
 
-                    # Stop if we have retrieved all matches
-                    if search_result_position >= total_matches:
-                        break
-                else:
+                # A short page is the last one holding records
+                if len(page.InfoList) < max_results:
                     break
 
-            except requests.exceptions.RequestException as e:
-                break
+            # Drop the pages that have not been requested yet once the loop stops early
+            for future in futures:
+                future.cancel()
 
         return all_records
 
-    def get_employee_by_device_id(self, employee_no_string):
+    def get_employees_by_device_ids(self, device_ids):
         """
-        Fetch employee details based on the attendance device ID.
+        Fetch employee details for a batch of attendance device IDs.
 
-        This method queries the database to find an employee record that matches the
-        given `attendance_device_id`. If no matching record is found, it logs a message.
-        If found, it returns the employee details.
+        This method looks the device IDs up in the cached employee map returned by
+        `_load_employee_map`, and returns the matching employees keyed by device ID for
+        constant-time lookup while processing logs.
 
         Parameters:
-            employee_no_string (str): The attendance device ID of the employee to search for.
+            device_ids (iterable): The attendance device IDs of the employees to search for.
 
         Returns:
-            dict or None: A dictionary containing the employee details
-            (`name` and `employee_name`) if found, or `None` if no match is found.
+            dict: A mapping of `attendance_device_id` to the employee details
+            (`name`, `employee_name`, `attendance_device_id` and `status`). Device IDs with no
+            matching employee are absent from the mapping.
 
         Example:
-            _input_: employee_no_string = "EMP123"
-            _output_: {"name": "EMP-001", "employee_name": "John Doe"}
+            _input_: device_ids = {"EMP123", "EMP456"}
+            _output_: {"EMP123": {"name": "EMP-001", "employee_name": "John Doe", ...}}
 
         Notes:
             - The `attendance_device_id` field must be unique for each employee in the system.
-            - Logs a message to the console if no employee is found or if an employee is found.
         """
-        employee = frappe.db.get_value(
-            "Employee",
-            {"attendance_device_id": employee_no_string},
-            ["name", "employee_name"],
-            as_dict=True
-        )
-        if not employee:
-            print(f"No employee found for device ID: {employee_no_string}")
-        else:
-            print(f"Found employee {employee}")
-        return employee
-
-    def process_logs(self, data):
+        employee_map = _load_employee_map()
+        return {
+            device_id: employee_map[device_id]
+            for device_id in device_ids
+            if device_id in employee_map
+        }
+
+    def process_logs(self, data, update_last_sync=True):
         """
         Process attendance logs and push each valid record to the Employee Checkin.
 
@@ -207,160 +354,290 @@ class Attendance:
         field for all shift types to the current timestamp.
 
         Parameters:
-            data (list): A list of attendance records fetched from the device. Each record
-                         should be a dictionary containing attendance details.
+            data (list): A list of attendance records (`AcsEventRecord`) fetched from the device.
+            update_last_sync (bool): Whether to update `last_sync_of_checkin` of all shift types
+                                     in the same transaction. Callers syncing several devices
+                                     pass `False` and call `update_last_sync_of_checkin` once.
 
         Returns:
             None
 
         Steps:
-            1. Filters out logs without the `employeeNoString` field.
-            2. For each valid log:
-               - Fetches the corresponding employee using `attendance_device_id`.
-               - Skips processing if the employee is not found.
-               - Parses and formats the timestamp.
-               - Logs the check-in data using `log_employee_attendance`.
-            3. Updates the `last_sync_of_checkin` field for all shift types to the current timestamp.
+            1. Groups the logs by `employeeNoString`, filtering out logs without the
+               `employeeNoString` or `time` field.
+            2. Fetches all matching employees at once using `get_employees_by_device_ids`.
+            3. For each device ID:
+               - Looks up the corresponding employee by `attendance_device_id` once.
+               - Skips all its logs if the employee is not found.
+               - Parses the timestamps and sorts the logs by time.
+            4. Loads the existing check-ins for the batch window using `get_existing_checkins`
+               and drops duplicates.
+            5. Logs the remaining check-ins one by one using `log_employee_attendance`, or in one
+               insert using `bulk_log_employee_attendance` when `use_bulk_insert` allows it.
+            6. Unless `update_last_sync` is `False`, updates the `last_sync_of_checkin` field for
+               all shift types using `update_last_sync_of_checkin`.
 
         Raises:
             ValueError: If the `data` parameter is not a list.
 
         Notes:
             - Logs are skipped if they lack a timestamp or an `employeeNoString`.
-            - Timestamps are converted from ISO 8601 format to `YYYY-MM-DD HH:MM:SS`.
-            - Database changes are committed after updating the shift types.
+            - A single summary line is written to the `attendance_sync` logger per batch. It
+              counts every fetched log once: logged, skipped (no employee for the device ID),
+              duplicates, and invalid (no `employeeNoString` or `time`). Skipped and
+              duplicate logs are only logged one by one in developer mode.
+            - Timestamps are parsed from ISO 8601 format once, keeping the device's wall time,
+              and only formatted to `YYYY-MM-DD HH:MM:SS` when written to the database.
+            - Set `attendance_sync_bulk_insert_checkins` in the site config to skip Employee
+              Checkin validation and hooks and insert the batch at once; this is ignored while
+              any Shift Type has auto attendance enabled (see `use_bulk_insert`).
+            - The check-in inserts and the shift type update are committed together once,
+              and rolled back if any of them fails.
+            - The duplicate check and the inserts run under the `CHECKIN_LOCK_NAME` file lock
+              until the commit, so concurrent syncs of other devices are serialized there and
+              cannot log the same `(employee, time)` twice.
 
         Example:
             _input_:
                 data = [
-                    {
-                        "employeeNoString": "EMP123",
-                        "time": "2025-01-07T09:00:00Z",
-                        ...
-                    },
+                    AcsEventRecord(employeeNoString="EMP123", time="2025-01-07T09:00:00Z"),
                     ...
                 ]
             _output_: None
         """
+        logger = frappe.logger("attendance_sync")
         if not data:
-            print("Invalid data received from Device.")
+            logger.info(f"No attendance logs received from device {self.device_ip}.")
             return
 
-        # Filter logs containing the `employeeNoString` field
-        filtered_info_list = [item for item in data if "employeeNoString" in item]
-
-        for record in filtered_info_list:
-            employee_no_string = record["employeeNoString"]
-
-            # Fetch employee using `attendance_device_id`
-            employee = self.get_employee_by_device_id(employee_no_string)
+        # Per-record logging is only done in developer mode
+        log_records = frappe.conf.developer_mode
+
+        # Group logs containing the `employeeNoString` and `time` fields by device ID
+        records_by_device_id = defaultdict(list)
+        invalid = 0
+        for record in data:
+            if record.employeeNoString and record.time:
+                records_by_device_id[record.employeeNoString].append(record)
+            else:
+                invalid += 1
+
+        # Fetch all employees for the batch using `attendance_device_id`
+        employee_map = self.get_employees_by_device_ids(records_by_device_id)
+
+        checkins = []
+        skipped = 0
+        for device_id, records in records_by_device_id.items():
+            employee = employee_map.get(device_id)
             if not employee:
+                # Skip all logs of an unknown device ID at once
+                skipped += len(records)
+                if log_records:
+                    logger.debug(f"No employee found for device ID: {device_id}")
                 continue
 
-            emp_no = employee['name']
+            # Parse each timestamp once, keeping the device's local wall time
+            employee_checkins = sorted(
+                ((ciso8601.parse_datetime(record.time).replace(tzinfo=None), record)
+                 for record in records),
+                key=itemgetter(0)
+            )
+            checkins.extend(
+                (employee, record, checkin_time) for checkin_time, record in employee_checkins
+            )
+
+        # Hold the lock from the duplicate check until the commit, so concurrent syncs of
+        # other devices cannot insert the same check-in unseen in between
+        with filelock(CHECKIN_LOCK_NAME, timeout=CHECKIN_LOCK_TIMEOUT):
+            new_checkins = []
+            if checkins:
+                # Load the already-logged check-ins for the batch window in a single query
+                checkin_times = [checkin_time for _, _, checkin_time in checkins]
+                existing_checkins = self.get_existing_checkins(
+                    {employee.name for employee, _, _ in checkins},
+                    min(checkin_times),
+                    max(checkin_times)
+                )
+
+                # Drop check-ins already logged, including duplicate scans within the batch
+                for employee, record, checkin_time in checkins:
+                    if (employee.name, checkin_time) in existing_checkins:
+                        if log_records:
+                            logger.debug(f"Duplicate check-in found for {employee.name} at {checkin_time}. Skipping log.")
+                        continue
+                    existing_checkins.add((employee.name, checkin_time))
+                    new_checkins.append((employee, record, checkin_time))
+
+            # Log the check-ins (and update the shift types) in a single transaction
+            try:
+                # Log the check-in data
+                if self.use_bulk_insert():
+                    self.bulk_log_employee_attendance(new_checkins)
+                else:
+                    for employee, record, checkin_time in new_checkins:
+                        self.log_employee_attendance(employee.name, record, checkin_time)
 
-            # Extract and format timestamp
-            timestamp = record.get("time", "")
-            if not timestamp:
-                continue  # Skip if no timestamp
+                if update_last_sync:
+                    update_last_sync_of_checkin()
 
-            # Parse the timestamp (adjust if needed)
-            timestamp_obj = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
-            formatted_timestamp = timestamp_obj.strftime("%Y-%m-%d %H:%M:%S")
+                frappe.db.commit()
+            except Exception:
+                frappe.db.rollback()
+                raise
 
-            # Log the check-in data
-            self.log_employee_attendance(emp_no, record, formatted_timestamp)
+        logger.info(
+            f"Synced attendance from device {self.device_ip}: logged={len(new_checkins)} "
+            f"skipped={skipped} duplicates={len(checkins) - len(new_checkins)} invalid={invalid}"
+        )
+
+    def use_bulk_insert(self):
+        """
+        Check whether check-ins may be logged with `bulk_log_employee_attendance`.
 
-        # Update `last_sync_of_checkin` for all shift types
-        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        shift_types = frappe.get_all("Shift Type", fields=["name"])
-        for shift_type in shift_types:
-            frappe.db.set_value("Shift Type", shift_type["name"], "last_sync_of_checkin", now)
-        frappe.db.commit()
+        Bulk inserts skip the Employee Checkin validation, so the rows get no shift details
+        (`shift`, `shift_start`, `shift_actual_end`, ...). HRMS auto attendance only
+        considers check-ins linked to a shift, so bulk inserts are only used when the site
+        config `attendance_sync_bulk_insert_checkins` is set and no Shift Type has auto
+        attendance enabled.
 
-    def log_employee_attendance(self, emp_no, record, formatted_timestamp):
+        Returns:
+            bool: `True` if the batch may be bulk inserted, `False` if each check-in must go
+            through `log_employee_attendance`.
         """
-        Log employee IN and OUT times based on individual attendance records.
+        if not frappe.conf.get("attendance_sync_bulk_insert_checkins"):
+            return False
+        return not frappe.db.exists("Shift Type", {"enable_auto_attendance": 1})
 
-        This method ensures duplicate check-ins are avoided and logs valid attendance
-        records to the Employee Checkin table.
+    def bulk_log_employee_attendance(self, checkins):
+        """
+        Log a batch of employee check-ins to the Employee Checkin table in one insert.
+
+        This method writes all rows directly with `frappe.db.bulk_insert`, skipping the
+        per-document validation and hooks run by `add_log_based_on_employee_field`.
+        Duplicate detection must be done by the caller.
 
         Parameters:
-            emp_no (str): The employee number (typically the primary key in the Employee table).
-            record (dict): The attendance record containing details like `employeeNoString`.
-            formatted_timestamp (str): The timestamp of the attendance record in the format
-                                       `YYYY-MM-DD HH:MM:SS`.
+            checkins (list): `(employee, record, checkin_time)` tuples, where `employee`
+                             holds the `name`, `employee_name` and `status` of the Employee,
+                             `record` is the attendance record containing `employeeNoString`,
+                             and `checkin_time` is the naive `datetime` of the check-in.
 
         Returns:
             None
 
-        Steps:
-            1. Checks if a duplicate check-in exists for the given employee and timestamp.
-            2. If no duplicate is found:
-               - Logs the check-in record to the Employee Checkin table using
-                 `add_log_based_on_employee_field`.
-            3. If a duplicate is found, skips logging and prints a message.
+        Example:
+            _input_:
+                checkins = [
+                    (
+                        {"name": "EMP-001", "employee_name": "John Doe"},
+                        AcsEventRecord(employeeNoString="EMP123", ...),
+                        datetime(2025, 1, 7, 9, 0, 0)
+                    ),
+                    ...
+                ]
+            _output_: None
+
+        Notes:
+            - Shift details are not fetched for the inserted check-ins; only used when
+              `use_bulk_insert` allows it.
+            - Check-ins of employees that are not Active are logged one by one with
+              `log_employee_attendance` instead, as they are not validated here.
+        """
+        active_checkins = []
+        for employee, record, checkin_time in checkins:
+            if employee.status == "Active":
+                active_checkins.append((employee, record, checkin_time))
+            else:
+                self.log_employee_attendance(employee.name, record, checkin_time)
+        checkins = active_checkins
+
+        if not checkins:
+            return
+
+        timestamp = frappe.utils.now()
+        user = frappe.session.user
+        fields = ["name", "employee", "employee_name", "time", "device_id",
+                  "owner", "modified_by", "creation", "modified"]
+        values = [
+            (frappe.generate_hash(length=10), employee.name, employee.employee_name,
+             checkin_time.strftime(CHECKIN_TIME_FORMAT), record.employeeNoString,
+             user, user, timestamp, timestamp)
+            for employee, record, checkin_time in checkins
+        ]
+        frappe.db.bulk_insert("Employee Checkin", fields=fields, values=values)
+
+    def log_employee_attendance(self, emp_no, record, checkin_time):
+        """
+        Log a single employee check-in to the Employee Checkin table.
+
+        This method pushes the check-in through `add_log_based_on_employee_field`, so the
+        Employee Checkin validation and hooks run for the record. Duplicate detection must
+        be done by the caller.
+
+        Parameters:
+            emp_no (str): The employee number (typically the primary key in the Employee table).
+            record (AcsEventRecord): The attendance record containing details like `employeeNoString`.
+            checkin_time (datetime): The naive timestamp of the attendance record.
+
+        Returns:
+            None
 
         Example:
             _input_:
                 emp_no = "EMP-001"
-                record = {
-                    "employeeNoString": "EMP123",
-                    ...
-                }
-                formatted_timestamp = "2025-01-07 09:00:00"
+                record = AcsEventRecord(employeeNoString="EMP123", ...)
+                checkin_time = datetime(2025, 1, 7, 9, 0, 0)
             _output_: None
 
         Notes:
-            - Duplicate detection is done using `check_duplicate_checkin`.
-            - Logs are added via the `add_log_based_on_employee_field` method.
+            - This is the default path; `bulk_log_employee_attendance` is only used when
+              `use_bulk_insert` allows it.
         """
-        # Check for duplicate check-ins with the same timestamp
-        if not self.check_duplicate_checkin(emp_no, formatted_timestamp):
-            # Push the record to Employee Checkin table
-            add_log_based_on_employee_field(
-                employee_field_value=emp_no,
-                timestamp=formatted_timestamp,
-                employee_fieldname="name",
-                device_id=record['employeeNoString']
-            )
-        else:
-            print(f"Duplicate check-in found for {emp_no} at {formatted_timestamp}. Skipping log.")
+        # Push the record to Employee Checkin table
+        add_log_based_on_employee_field(
+            employee_field_value=emp_no,
+            timestamp=checkin_time.strftime(CHECKIN_TIME_FORMAT),
+            employee_fieldname="name",
+            device_id=record.employeeNoString
+        )
 
-    def check_duplicate_checkin(self, emp_no, timestamp):
+    def get_existing_checkins(self, employees, start_time, end_time):
         """
-        Check if an Employee Checkin record exists for the given employee and timestamp.
+        Fetch the Employee Checkin records already logged for a batch of employees.
 
-        This method queries the database to determine if a check-in record already exists
-        for the specified employee and timestamp. It helps prevent duplicate entries in
-        the Employee Checkin table.
+        This method queries the database once for all check-ins of the given employees
+        within the timestamp window of the batch, so duplicate detection can be done
+        in memory instead of issuing one query per record.
 
         Parameters:
-            emp_no (str): The employee number (primary key or unique identifier in the Employee table).
-            timestamp (str): The check-in timestamp in the format `YYYY-MM-DD HH:MM:SS`.
+            employees (iterable): The employee numbers (primary keys in the Employee table).
+            start_time (datetime): The earliest check-in time of the batch.
+            end_time (datetime): The latest check-in time of the batch.
 
         Returns:
-            bool: `True` if a duplicate record exists, `False` otherwise.
+            set: `(employee, time)` pairs, with `time` as a `datetime`.
 
         Example:
-            _input_: emp_no = "EMP-001", timestamp = "2025-01-07 09:00:00"
-            _output_: True
+            _input_:
+                employees = {"EMP-001"}
+                start_time = datetime(2025, 1, 7, 9, 0, 0)
+                end_time = datetime(2025, 1, 7, 18, 0, 0)
+            _output_: {("EMP-001", datetime(2025, 1, 7, 9, 0, 0))}
 
         Notes:
-            - This method relies on the `frappe.db.exists` function to check for duplicates.
             - Ensures data integrity by avoiding duplicate check-ins for the same time.
-
         """
-        existing_checkin = frappe.db.exists(
+        existing_checkins = frappe.db.get_all(
             "Employee Checkin",
-            {
-                "employee": emp_no,
-                "time": timestamp
-            }
+            filters={
+                "employee": ["in", list(employees)],
+                "time": ["between", [start_time, end_time]]
+            },
+            fields=["employee", "time"]
         )
-        return existing_checkin
+        return {(checkin.employee, get_datetime(checkin.time)) for checkin in existing_checkins}
 
-    def get_and_process_attendance(self, start_time, end_time):
+    def get_and_process_attendance(self, start_time, end_time, update_last_sync=True):
         """
         Main method to fetch and process attendance logs.
 
@@ -371,6 +648,8 @@ class Attendance:
         Parameters:
             start_time (str or datetime): The start time for fetching the attendance logs.
             end_time (str or datetime): The end time for fetching the attendance logs.
+            update_last_sync (bool): Passed to `process_logs`; whether to update
+                                     `last_sync_of_checkin` of all shift types.
 
         Returns:
             None
@@ -391,16 +670,66 @@ class Attendance:
             - `start_time` and `end_time` should be in a format compatible with the device's
               expected timestamp format.
             - The method calls `process_logs` after retrieving and verifying the data.
+            - The device session is closed once the logs are fetched, releasing its
+              kept-alive connections.
         """
-        data = self.fetch_all_attendance_logs(self._format_time(start_time),
-                                              self._format_time(end_time))
+        try:
+            data = self.fetch_all_attendance_logs(self._format_time(start_time),
+                                                  self._format_time(end_time))
+        finally:
+            self._session.close()
         if data:
-            self.process_logs(data)
+            self.process_logs(data, update_last_sync=update_last_sync)
+
+
+def update_last_sync_of_checkin():
+	"""
+	Set `last_sync_of_checkin` of all shift types to the current time.
+
+	Runs a single UPDATE statement; committing is left to the caller. HRMS auto attendance
+	only processes check-ins up to this time, so it must only be moved forward once all
+	check-ins up to now have been logged.
+	"""
+	now = datetime.now().strftime(CHECKIN_TIME_FORMAT)
+	frappe.db.sql("UPDATE `tabShift Type` SET last_sync_of_checkin = %s", (now,))
+
+
+@redis_cache(ttl=1800)
+def _load_employee_map():
+	"""
+	Load all employees that have an attendance device ID, keyed by that ID.
+
+	The result is cached in Redis for 30 minutes, so hourly syncs across devices do not
+	re-query the Employee table. The cache is cleared by `clear_employee_map_cache` whenever
+	an Employee is saved, renamed or deleted. Changes made without document hooks (e.g. with
+	`frappe.db.set_value`) are only picked up once the cache expires.
+
+	Returns:
+		dict: A mapping of `attendance_device_id` to the employee details
+		(`name`, `employee_name`, `attendance_device_id` and `status`).
+	"""
+	employees = frappe.db.get_all(
+		"Employee",
+		filters={"attendance_device_id": ["is", "set"]},
+		fields=["name", "employee_name", "attendance_device_id", "status"]
+	)
+	return {employee.attendance_device_id: employee for employee in employees}
+
+
+def clear_employee_map_cache(doc, method=None, *args):
+	"""
+	Clear the cached employee map when an Employee changes.
+
+	Hooked to the `on_update`, `after_rename` and `on_trash` events of Employee in
+	`hooks.py`. `after_rename` also passes the old and new names and the merge flag,
+	which are ignored.
+	"""
+	_load_employee_map.clear_cache()
 
 
 @frappe.whitelist()
 def process_attendance_in_background(start_date, end_date, device_ip, major, minor, device_user,
-                                     device_user_password):
+                                     device_user_password, attendance_depth=None):
 	"""
 	Process attendance logs in the background for a specified date range.
 
@@ -418,6 +747,8 @@ def process_attendance_in_background(start_date, end_date, device_ip, major, min
 		minor (str): The minor version of the attendance device.
 		device_user (str): The username to authenticate with the device.
 		device_user_password (str): The password to authenticate with the device.
+		attendance_depth (int, optional): The number of logs to request from the device
+										  per page.
 
 	Returns:
 		None
@@ -436,6 +767,7 @@ def process_attendance_in_background(start_date, end_date, device_ip, major, min
 			minor = "0"
 			device_user = "admin"
 			device_user_password = "password"
+			attendance_depth = 100
 		_output_: None
 
 	Notes:
@@ -448,7 +780,8 @@ def process_attendance_in_background(start_date, end_date, device_ip, major, min
 		major=major,
 		minor=minor,
 		device_user=device_user,
-		device_password=device_user_password
+		device_password=device_user_password,
+		attendance_depth=attendance_depth
 	)
 	attendance.get_and_process_attendance(start_date, end_date)
 
@@ -52,7 +52,8 @@ frappe.ui.form.on("Device Configuration", {
 							major: frm.doc.major,
 							minor: frm.doc.minor,
 							device_user: frm.doc.device_user,
-							device_user_password: frm.doc.device_user_password
+							device_user_password: frm.doc.device_user_password,
+							attendance_depth: frm.doc.attendance_depth
 						},
 						callback: function (r) {
 							if (r.message) {
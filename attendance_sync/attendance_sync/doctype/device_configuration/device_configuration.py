@@ -12,7 +12,7 @@ class DeviceConfiguration(Document):
 
 @frappe.whitelist()
 def fetch_attendance(start_date, end_date, device_ip, major, minor, device_user,
-					 device_user_password):
+					 device_user_password, attendance_depth=None):
 	"""
 	Queues the process to fetch attendance data from a biometric device or similar source.
 
@@ -27,6 +27,7 @@ def fetch_attendance(start_date, end_date, device_ip, major, minor, device_user,
 		minor (int): Minor version of the device firmware (used for compatibility checks).
 		device_user (str): Username for authenticating with the attendance device.
 		device_user_password (str): Password for authenticating with the attendance device.
+		attendance_depth (int, optional): Number of logs to request from the device per page.
 
 	Returns:
 		str: A message indicating that the attendance fetch process has been queued.
@@ -49,7 +50,8 @@ def fetch_attendance(start_date, end_date, device_ip, major, minor, device_user,
 				"major": 2,
 				"minor": 0,
 				"device_user": "admin",
-				"device_user_password": "password123"
+				"device_user_password": "password123",
+				"attendance_depth": 100
 			},
 			callback: function(response) {
 				console.log(response.message);
@@ -66,6 +68,7 @@ def fetch_attendance(start_date, end_date, device_ip, major, minor, device_user,
 		minor=minor,
 		device_user=device_user,
 		device_user_password=device_user_password,
+		attendance_depth=attendance_depth,
 		queue='long',
 		timeout=3000
 	)
@@ -137,13 +137,13 @@ add_to_apps_screen = [
 # ---------------
 # Hook on document methods and events
 
-# doc_events = {
-# 	"*": {
-# 		"on_update": "method",
-# 		"on_cancel": "method",
-# 		"on_trash": "method"
-# 	}
-# }
+doc_events = {
+	"Employee": {
+		"on_update": "attendance_sync.attendance_sync.Attendance.clear_employee_map_cache",
+		"after_rename": "attendance_sync.attendance_sync.Attendance.clear_employee_map_cache",
+		"on_trash": "attendance_sync.attendance_sync.Attendance.clear_employee_map_cache"
+	}
+}
 
 # Scheduled Tasks
 # ---------------
@@ -0,0 +1,11 @@
+import frappe
+
+
+def execute():
+	"""
+	Add a composite index on `(employee, time)` to the Employee Checkin table.
+
+	The duplicate check in `Attendance.get_existing_checkins` filters check-ins by a list of
+	employees and a time window; the index lets it seek per employee instead of scanning.
+	"""
+	frappe.db.add_index("Employee Checkin", ["employee", "time"], index_name="employee_time_index")
@@ -1,22 +1,66 @@
 import frappe
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from attendance_sync.attendance_sync.Attendance import Attendance
+from attendance_sync.attendance_sync.Attendance import Attendance, update_last_sync_of_checkin
+
+# Maximum number of devices synced at the same time
+MAX_DEVICE_WORKERS = 8
+
+
+def _process_device_attendance(site, sites_path, device, start_time, end_time):
+	"""
+	Fetch and process attendance logs for a single device in a worker thread.
+
+	Frappe keeps the site and database connection per thread, so the worker initialises
+	and connects to the site itself, and tears the connection down when done.
+
+	Parameters:
+		site (str): The site to connect to.
+		sites_path (str): The path of the bench sites directory.
+		device (dict): The Device Configuration fields of the device.
+		start_time (datetime): The start time for fetching the attendance logs.
+		end_time (datetime): The end time for fetching the attendance logs.
+
+	Returns:
+		None
+	"""
+	frappe.init(site=site, sites_path=sites_path)
+	frappe.connect()
+	try:
+		# Create an instance of the Attendance class for the device
+		attendance = Attendance(
+			device_ip=device.device_ip,
+			major=device.major,
+			minor=device.minor,
+			device_user=device.device_user,
+			device_password=device.device_user_password,
+			attendance_depth=device.attendance_depth
+		)
+		# Process the attendance for the given device; the shift types are updated once
+		# by `get_attendance_from_device` after all devices are synced
+		attendance.get_and_process_attendance(start_time, end_time, update_last_sync=False)
+	finally:
+		frappe.destroy()
+
 
 def get_attendance_from_device():
 	"""
 	Fetch and process attendance logs for all devices configured in the system.
 
 	This method retrieves all device configuration documents from the Frappe system,
-	loops through each configuration, and processes attendance logs for the current day
-	(00:00:00 to 23:59:59) for each device.
+	and processes attendance logs for the current day (00:00:00 to 23:59:59) for each
+	device, syncing up to `MAX_DEVICE_WORKERS` devices concurrently.
 
 	Steps:
 		1. Fetches all Device Configuration documents from the Frappe database.
 		2. Sets the current date as the start and end time range for fetching attendance logs.
-		3. Loops through each device configuration, creating an instance of the `Attendance` class
-		   for each device.
+		3. Dispatches each device configuration to a thread pool, where
+		   `_process_device_attendance` creates an instance of the `Attendance` class for the
+		   device on its own database connection.
 		4. Calls the `get_and_process_attendance` method to fetch and process the attendance logs
 		   for each device.
+		5. Logs every device that failed and re-raises the first failure; if all devices
+		   succeeded, updates `last_sync_of_checkin` of all shift types once.
 
 	Parameters:
 		None
@@ -31,26 +75,48 @@ def get_attendance_from_device():
 	Notes:
 		- The method processes attendance logs for the current day (from midnight to 11:59 PM).
 		- It assumes the presence of valid `Device Configuration` documents in the system.
+		- Devices are fetched concurrently, so the total run time is bound by the slowest
+		  device rather than the sum of all devices. Their duplicate checks and check-in
+		  inserts are serialized by the file lock taken in `Attendance.process_logs`.
+		- `last_sync_of_checkin` is not moved forward when any device fails, so HRMS auto
+		  attendance does not process the period before its check-ins are logged.
 	"""
 	# Fetch all Device Configuration documents
 	device_configurations = frappe.get_all('Device Configuration',
 										   fields=['device_ip', 'major', 'minor', 'device_user',
-												   'device_user_password'])
+												   'device_user_password', 'attendance_depth'])
 
 	# Get the current time
 	now = datetime.now()
 	start_time = now.replace(hour=0, minute=0, second=0, microsecond=0)
 	end_time = now.replace(hour=23, minute=59, second=59, microsecond=0)
 
-	# Loop through each device configuration
-	for device in device_configurations:
-		# Create an instance of the Attendance class for each device
-		attendance = Attendance(
-			device_ip=device.device_ip,
-			major=device.major,
-			minor=device.minor,
-			device_user=device.device_user,
-			device_password=device.device_user_password
-		)
-		# Process the attendance for the given device
-		attendance.get_and_process_attendance(start_time, end_time)
+	if not device_configurations:
+		return
+
+	# Process the devices concurrently, each on its own site connection
+	site = frappe.local.site
+	sites_path = frappe.local.sites_path
+	with ThreadPoolExecutor(max_workers=min(MAX_DEVICE_WORKERS, len(device_configurations))) as executor:
+		futures = [
+			executor.submit(_process_device_attendance, site, sites_path, device, start_time,
+							end_time)
+			for device in device_configurations
+		]
+
+	# Log every failed device, not only the first one
+	failures = []
+	for device, future in zip(device_configurations, futures):
+		try:
+			future.result()
+		except Exception as e:
+			frappe.logger("attendance_sync").error(
+				f"Failed to sync attendance from device {device.device_ip}: {e}", exc_info=e
+			)
+			failures.append(e)
+
+	if failures:
+		raise failures[0]
+
+	update_last_sync_of_checkin()
+	frappe.db.commit()